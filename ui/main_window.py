@@ -1,8 +1,12 @@
+import concurrent.futures
 import os
+import queue
 import subprocess
+import threading
 import time
+from dataclasses import dataclass
 
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (
     QComboBox,
     QFileDialog,
@@ -18,51 +22,156 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
-from video_compressor.compressor import VideoCompressor
+from video_compressor.compressor import get_compressor
 
+# Расширения видеофайлов, которые попадают в обработку
+_VIDEO_EXTS = frozenset({".mp4", ".mkv", ".avi", ".mov", ".wmv", ".webm"})
 
-# Поток для сжатия одного файла
-class CompressionThread(QThread):
+# Контейнер результата для кодека (по умолчанию .mp4)
+_CODEC_EXT = {"vp9": ".webm", "av1": ".mkv"}
+
+# Пункт комбобокса аппаратного ускорения -> идентификатор для компрессора
+_HW_ACCEL_BY_LABEL = {"NVIDIA": "nvidia", "AMD": "amd", "Intel": "intel"}
+
+
+def _format_result_message(message, elapsed_time, input_size_mb, output_size_mb):
+    """Собирает текст итогового сообщения (вне UI-потока)"""
+    minutes, seconds = divmod(int(elapsed_time), 60)
+    result = f"{message}\n\nВремя обработки: {minutes} мин. {seconds} сек."
+    if input_size_mb > 0:
+        compression_ratio = (output_size_mb / input_size_mb) * 100
+        result += f"\n\nИсходный размер: {input_size_mb:.2f} МБ\n"
+        result += f"Конечный размер: {output_size_mb:.2f} МБ\n"
+        result += f"Степень сжатия: {compression_ratio:.1f}%"
+    return result
+
+
+def _entry_path(entry):
+    """Путь из os.DirEntry либо уже готовой строки"""
+    return entry.path if isinstance(entry, os.DirEntry) else entry
+
+
+def _entry_size(entry):
+    """Размер файла: у DirEntry stat приходит вместе с перечислением каталога"""
+    if isinstance(entry, os.DirEntry):
+        return entry.stat(follow_symlinks=False).st_size
+    return os.path.getsize(entry)
+
+
+# Один составной объект на тик прогресса: сигнал с тремя аргументами
+# конвертирует каждый из них в QVariant отдельно
+@dataclass(slots=True)
+class ProgressTick:
+    overall: int  # Общий процент
+    file: str  # Текущий файл
+    file_pct: int  # Процент текущего файла
+
+
+# Сигналы фоновой оценки размера (QRunnable не умеет pyqtSignal напрямую)
+class _EstimateSignals(QObject):
+    finished = pyqtSignal(int, float)  # Токен запроса, суммарный размер в МБ
+
+
+# Фоновая оценка размера, чтобы не блокировать UI на больших папках
+class EstimateWorker(QRunnable):
+    def __init__(self, compressor, files, codec, crf, token):
+        super().__init__()
+        self.compressor = compressor
+        self.files = files
+        self.codec = codec
+        self.crf = crf
+        self.token = token
+        self.signals = _EstimateSignals()
+
+    def run(self):
+        try:
+            # Пакетный API сам распараллеливает ffprobe asyncio-подпроцессами
+            total = sum(
+                self.compressor.estimate_output_sizes(
+                    [_entry_path(f) for f in self.files], self.codec, self.crf
+                )
+            )
+        except Exception as e:
+            print(f"Ошибка при оценке размера: {str(e)}")
+            total = -1.0
+        self.signals.finished.emit(self.token, total)
+
+
+# Сигналы задач сжатия: QRunnable не наследует QObject,
+# поэтому сигналы живут в отдельном держателе
+class _CompressionSignals(QObject):
     progress_update = pyqtSignal(int)
-    compression_finished = pyqtSignal(bool, str, float, float, float)  # Добавлены размеры
+    compression_finished = pyqtSignal(bool, str)  # Успех, готовое сообщение
+
 
+class _FolderCompressionSignals(QObject):
+    progress_update = pyqtSignal(object)  # ProgressTick
+    compression_finished = pyqtSignal(bool, str)  # Успех, готовое сообщение
+
+
+# Задача сжатия одного файла
+class CompressionRunnable(QRunnable):
     def __init__(self, input_file, output_file, codec, crf, hw_accel):
         super().__init__()
+        # MainWindow держит ссылку на задачу (stop/finished) —
+        # пул не должен удалять её после выполнения
+        self.setAutoDelete(False)
+        self.signals = _CompressionSignals()
+        self.finished = False
         self.input_file = input_file
         self.output_file = output_file
         self.codec = codec
         self.crf = crf
         self.hw_accel = hw_accel
-        self.compressor = VideoCompressor()
+        self.compressor = get_compressor()
         self.process = None
+        self._last_emit_ns = 0
+        self._last_pct = -1
+
+    def _emit_progress(self, percent):
+        """Отправляет прогресс в UI не чаще раза в 50 мс и только при изменении"""
+        now = time.monotonic_ns()
+        if percent != self._last_pct and (now - self._last_emit_ns > 50_000_000 or percent >= 100):
+            self.signals.progress_update.emit(percent)
+            self._last_pct = percent
+            self._last_emit_ns = now
 
     def run(self):
         try:
             start_time = time.time()
             input_size_mb = os.path.getsize(self.input_file) / (1024 * 1024)
-            self.compressor.compress_video(
+            output_size = self.compressor.compress_video(
                 self.input_file,
                 self.output_file,
                 self.codec,
                 self.crf,
                 self.hw_accel,
-                self.progress_update.emit,
+                self._emit_progress,
             )
             elapsed_time = time.time() - start_time
-            output_size_mb = (
-                os.path.getsize(self.output_file) / (1024 * 1024)
-                if os.path.exists(self.output_file)
-                else 0
-            )
-            self.compression_finished.emit(
-                True, "Сжатие видео успешно завершено", elapsed_time, input_size_mb, output_size_mb
+            # Размер берём из потока прогресса ffmpeg; stat — только запасной путь
+            if output_size is not None:
+                output_size_mb = output_size / (1024 * 1024)
+            else:
+                output_size_mb = (
+                    os.path.getsize(self.output_file) / (1024 * 1024)
+                    if os.path.exists(self.output_file)
+                    else 0
+                )
+            self.signals.compression_finished.emit(
+                True,
+                _format_result_message(
+                    "Сжатие видео успешно завершено", elapsed_time, input_size_mb, output_size_mb
+                ),
             )
         except Exception as e:
             elapsed_time = time.time() - start_time if "start_time" in locals() else 0
-            self.compression_finished.emit(
-                False, f"Ошибка при сжатии видео: {str(e)}", elapsed_time, 0, 0
+            self.signals.compression_finished.emit(
+                False,
+                _format_result_message(f"Ошибка при сжатии видео: {str(e)}", elapsed_time, 0, 0),
             )
         finally:
+            self.finished = True
             if self.process and self.process.poll() is None:
                 self.process.terminate()
                 try:
@@ -80,99 +189,187 @@ class CompressionThread(QThread):
             except subprocess.TimeoutExpired:
                 self.process.kill()
                 self.process.wait()
-        self.wait()
-
 
-# Поток для сжатия папки
-class FolderCompressionThread(QThread):
-    progress_update = pyqtSignal(
-        int, str, int
-    )  # Общий процент, текущий файл, процент текущего файла
-    compression_finished = pyqtSignal(bool, str, float, float, float)  # Добавлены размеры
 
-    def __init__(self, input_folder, output_folder, codec, crf, hw_accel, video_files):
+# Задача сжатия папки
+class FolderCompressionRunnable(QRunnable):
+    def __init__(
+        self, input_folder, output_folder, codec, crf, hw_accel, video_files, max_workers=None
+    ):
         super().__init__()
+        self.setAutoDelete(False)
+        self.signals = _FolderCompressionSignals()
+        self.finished = False
         self.input_folder = input_folder
         self.output_folder = output_folder
         self.codec = codec
         self.crf = crf
         self.hw_accel = hw_accel
-        self.video_files = video_files
-        self.compressor = VideoCompressor()
+        # Сначала крупные файлы: LPT-эвристика сокращает хвост, когда один
+        # большой файл достаётся воркеру последним
+        self.video_files = sorted(video_files, key=_entry_size, reverse=True)
+        self.compressor = get_compressor()
         self.running = True
+        if max_workers is None:
+            # Аппаратные кодировщики держат несколько сессий параллельно
+            # (NVENC обычно до 8, QSV — около 4), программные упираются в CPU
+            if hw_accel == "nvidia":
+                max_workers = 6
+            elif hw_accel in ("amd", "intel"):
+                max_workers = 4
+            else:
+                max_workers = min((os.cpu_count() or 2) // 2, 4)
+        self.max_workers = max(1, max_workers)
+        # Делим ядра между параллельными программными кодированиями, чтобы
+        # N процессов libx264 не запускали по ncpu потоков каждый
+        self.per_job_threads = (
+            max(1, (os.cpu_count() or 1) // self.max_workers) if hw_accel is None else None
+        )
+        self._lock = threading.Lock()
+        self._futures = []
+        self._file_progress = {}
+        self._completed = 0
+        self._total_input_mb = 0.0
+        self._total_output_mb = 0.0
+        self._last_emit_ns = 0
+        self._last_pct = -1
+
+    def _emit_progress(self, overall_percent, file_name, file_percent, force=False):
+        """Коалесцирует сигналы прогресса: не чаще раза в 50 мс, только при изменении.
+
+        Вызывается под self._lock. force=True для сообщений о завершении файла.
+        """
+        now = time.monotonic_ns()
+        if force or (
+            (overall_percent, file_percent) != self._last_pct
+            and now - self._last_emit_ns > 50_000_000
+        ):
+            self.signals.progress_update.emit(
+                ProgressTick(overall_percent, file_name, file_percent)
+            )
+            self._last_pct = (overall_percent, file_percent)
+            self._last_emit_ns = now
 
     def run(self):
         try:
             start_time = time.time()
-            total_input_size_mb = 0
-            total_output_size_mb = 0
             total_files = len(self.video_files)
 
-            # Подсчет общего количества файлов для вычисления прогресса
-            total_processed = 0
-
-            for i, video_file in enumerate(self.video_files, 1):
-                if not self.running:
-                    break
-
-                input_size_mb = os.path.getsize(video_file) / (1024 * 1024)
-                total_input_size_mb += input_size_mb
-                base_name, ext = os.path.splitext(os.path.basename(video_file))
-                if self.codec == "vp9":
-                    output_ext = ".webm"
-                elif self.codec == "av1":
-                    output_ext = ".mkv"
-                else:
-                    output_ext = ".mp4"
-                output_file = os.path.join(
-                    self.output_folder, f"{base_name}_compressed{output_ext}"
-                )
-
-                # Расчет прогресса: завершенные файлы + прогресс текущего файла
-                def progress_callback(percent):
-                    overall_percent = int((total_processed + percent / 100) / total_files * 100)
-                    self.progress_update.emit(
-                        overall_percent, os.path.basename(video_file), percent
-                    )
-
-                # Обработка текущего файла
-                self.compressor.compress_video(
-                    video_file, output_file, self.codec, self.crf, self.hw_accel, progress_callback
-                )
+            # Стадия 1 (reader): заранее снимаем метаданные и готовим пути,
+            # чтобы stat-задержки не вклинивались между кодированиями
+            jobs = self._prepare_jobs()
 
-                output_size_mb = (
-                    os.path.getsize(output_file) / (1024 * 1024)
-                    if os.path.exists(output_file)
-                    else 0
-                )
-                total_output_size_mb += output_size_mb
-
-                # Увеличиваем счетчик завершенных файлов
-                total_processed += 1
+            # Стадия 3 (finalizer): отдельный поток снимает размер результата и
+            # шлёт сигналы, не задерживая кодировщики; maxsize даёт back-pressure
+            done_q = queue.Queue(maxsize=2)
+            finalizer = threading.Thread(
+                target=self._finalize_outputs, args=(done_q, total_files), daemon=True
+            )
+            finalizer.start()
 
-                # Обновляем общий прогресс
-                overall_percent = int(total_processed / total_files * 100)
-                self.progress_update.emit(overall_percent, f"Завершено {i}/{total_files}", 100)
+            try:
+                # Стадия 2 (encoder): пул воркеров, один compress_video на файл
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers
+                ) as executor:
+                    self._futures = [
+                        executor.submit(self._compress_one, job, total_files, done_q)
+                        for job in jobs
+                    ]
+                    for future in concurrent.futures.as_completed(self._futures):
+                        future.result()  # Пробрасываем исключение из воркера
+            finally:
+                done_q.put(None)
+                finalizer.join()
 
-            # Финальное обновление прогресса
-            self.progress_update.emit(overall_percent, f"Завершено {i}/{total_files}", 100)
             elapsed_time = time.time() - start_time
-            self.compression_finished.emit(
+            self.signals.compression_finished.emit(
                 True,
-                "Сжатие всех видео успешно завершено",
-                elapsed_time,
-                total_input_size_mb,
-                total_output_size_mb,
+                _format_result_message(
+                    "Сжатие всех видео успешно завершено",
+                    elapsed_time,
+                    self._total_input_mb,
+                    self._total_output_mb,
+                ),
             )
         except Exception as e:
             elapsed_time = time.time() - start_time if "start_time" in locals() else 0
-            self.compression_finished.emit(
-                False, f"Ошибка при сжатии видео: {str(e)}", elapsed_time, 0, 0
+            self.signals.compression_finished.emit(
+                False,
+                _format_result_message(f"Ошибка при сжатии видео: {str(e)}", elapsed_time, 0, 0),
             )
+        finally:
+            self.finished = True
+
+    def _prepare_jobs(self):
+        """Стадия чтения: размер входного файла и путь результата для каждого видео"""
+        jobs = []
+        for entry in self.video_files:
+            video_file = _entry_path(entry)
+            input_size_mb = _entry_size(entry) / (1024 * 1024)
+            base_name, ext = os.path.splitext(os.path.basename(video_file))
+            output_ext = _CODEC_EXT.get(self.codec, ".mp4")
+            output_file = os.path.join(self.output_folder, f"{base_name}_compressed{output_ext}")
+            jobs.append((video_file, input_size_mb, output_file))
+        return jobs
+
+    def _compress_one(self, job, total_files, done_q):
+        """Сжимает один файл и передаёт его финализатору"""
+        if not self.running:
+            return
+
+        video_file, input_size_mb, output_file = job
+
+        # Общий прогресс — сумма прогрессов всех файлов (завершённые дают по 100)
+        def progress_callback(percent):
+            with self._lock:
+                self._file_progress[video_file] = percent
+                overall_percent = int(sum(self._file_progress.values()) / total_files)
+                self._emit_progress(overall_percent, os.path.basename(video_file), percent)
+
+        output_size = self.compressor.compress_video(
+            video_file,
+            output_file,
+            self.codec,
+            self.crf,
+            self.hw_accel,
+            progress_callback,
+            threads=self.per_job_threads,
+        )
+        done_q.put((job, output_size))
+
+    def _finalize_outputs(self, done_q, total_files):
+        """Стадия финализации: размер результата, итоговые суммы и сигналы"""
+        while True:
+            item = done_q.get()
+            if item is None:
+                break
+            (video_file, input_size_mb, output_file), output_size = item
+            # Размер берём из потока прогресса ffmpeg; stat — только запасной путь
+            if output_size is not None:
+                output_size_mb = output_size / (1024 * 1024)
+            else:
+                output_size_mb = (
+                    os.path.getsize(output_file) / (1024 * 1024)
+                    if os.path.exists(output_file)
+                    else 0
+                )
+            with self._lock:
+                self._total_input_mb += input_size_mb
+                self._total_output_mb += output_size_mb
+                self._file_progress[video_file] = 100
+                self._completed += 1
+                overall_percent = int(sum(self._file_progress.values()) / total_files)
+                self._emit_progress(
+                    overall_percent, f"Завершено {self._completed}/{total_files}", 100, force=True
+                )
 
     def stop(self):
         """Безопасная остановка процесса сжатия"""
         self.running = False
+        # Снимаем с очереди ещё не начатые файлы; текущие кодирования доработают
+        for future in self._futures:
+            future.cancel()
 
 
 # Главное окно приложения
@@ -182,8 +379,25 @@ class MainWindow(QMainWindow):
         self.input_path = ""
         self.is_folder = False
         self.output_folder = ""
-        self.compression_thread = None
-        self.compressor = VideoCompressor()
+        self.compression_task = None
+        self.compressor = get_compressor()
+        self._scan_cache = {}  # Путь папки -> (mtime_ns, список файлов)
+        self._estimate_token = 0  # Отсекает устаревшие результаты фоновой оценки
+        # Последние показанные значения: слоты выходят сразу, если ничего не изменилось
+        self._last_bar_value = -1
+        self._last_file_pct = -1
+        # Состояние расчёта ETA (EMA мгновенной скорости прогресса)
+        self._ema_rate = None
+        self._last_eta_pct = 0
+        self._last_eta_t = 0.0
+        self._last_eta_text_t = 0.0
+        # Состояние инкрементального сканирования папки
+        self._scan_iter = None
+        self._scan_files = []
+        self._scan_folder = ""
+        self._scan_mtime = 0
+        self._scan_timer = QTimer(self)
+        self._scan_timer.timeout.connect(self._scan_chunk)
         self.init_ui()
 
     def init_ui(self):
@@ -310,12 +524,61 @@ class MainWindow(QMainWindow):
         if folder_path:
             self.input_path = folder_path
             self.is_folder = True
-            video_files = self.get_video_files(folder_path)
-            self.input_label.setText(
-                f"Входная папка: {os.path.basename(folder_path)} ({len(video_files)} видео)"
-            )
-            self.update_compress_button()
-            self.update_size_estimate()
+            self._start_folder_scan(folder_path)
+
+    def _start_folder_scan(self, folder_path):
+        """Запускает инкрементальное сканирование папки, не блокируя UI"""
+        self._stop_folder_scan()
+        try:
+            self._scan_mtime = os.stat(folder_path).st_mtime_ns
+            self._scan_iter = os.scandir(folder_path)
+        except OSError:
+            self.input_label.setText(f"Входная папка: {os.path.basename(folder_path)} (0 видео)")
+            return
+        self._scan_folder = folder_path
+        self._scan_files = []
+        self.input_label.setText(
+            f"Входная папка: {os.path.basename(folder_path)} (сканирование…)"
+        )
+        self._scan_timer.start(0)
+
+    def _scan_chunk(self):
+        """Обрабатывает до 256 записей каталога за тик таймера"""
+        for _ in range(256):
+            entry = next(self._scan_iter, None)
+            if entry is None:
+                self._finish_folder_scan()
+                return
+            name = entry.name.lower()
+            if (
+                os.path.splitext(name)[1] in _VIDEO_EXTS
+                and "compressed" not in name
+                and entry.is_file()
+            ):
+                self._scan_files.append(entry)
+        self.input_label.setText(
+            f"Входная папка: {os.path.basename(self._scan_folder)} "
+            f"(сканирование… {len(self._scan_files)})"
+        )
+
+    def _finish_folder_scan(self):
+        """Завершает сканирование: кеширует список и обновляет зависимые виджеты"""
+        self._scan_timer.stop()
+        self._scan_iter = None
+        self._scan_cache[self._scan_folder] = (self._scan_mtime, self._scan_files)
+        self.input_label.setText(
+            f"Входная папка: {os.path.basename(self._scan_folder)} "
+            f"({len(self._scan_files)} видео)"
+        )
+        self.update_compress_button()
+        self.update_size_estimate()
+
+    def _stop_folder_scan(self):
+        """Прерывает незавершённое сканирование (выбрана другая папка)"""
+        self._scan_timer.stop()
+        if self._scan_iter is not None:
+            self._scan_iter.close()
+            self._scan_iter = None
 
     def select_output_folder(self):
         folder_path = QFileDialog.getExistingDirectory(
@@ -327,14 +590,26 @@ class MainWindow(QMainWindow):
             self.update_compress_button()
 
     def get_video_files(self, folder_path):
-        video_extensions = [".mp4", ".mkv", ".avi", ".mov", ".wmv", ".webm"]
+        """Список видео в папке; результат кешируется по mtime папки"""
+        try:
+            dir_mtime = os.stat(folder_path).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._scan_cache.get(folder_path)
+        if cached is not None and cached[0] == dir_mtime:
+            return cached[1]
+
         files = []
-        for file in os.listdir(folder_path):
-            if (
-                any(file.lower().endswith(ext) for ext in video_extensions)
-                and "compressed" not in file.lower()
-            ):
-                files.append(os.path.join(folder_path, file))
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                name = entry.name.lower()
+                if (
+                    os.path.splitext(name)[1] in _VIDEO_EXTS
+                    and "compressed" not in name
+                    and entry.is_file()
+                ):
+                    files.append(entry)
+        self._scan_cache[folder_path] = (dir_mtime, files)
         return files
 
     def update_compress_button(self):
@@ -348,24 +623,30 @@ class MainWindow(QMainWindow):
         codec = self.codec_combo.currentText().split(" ")[0].lower()
         crf = self.crf_slider.value()
 
-        try:
-            if self.is_folder:
-                video_files = self.get_video_files(self.input_path)
-                total_estimated_size = 0
-                for video_file in video_files:
-                    estimated_size = self.compressor.estimate_output_size(video_file, codec, crf)
-                    total_estimated_size += estimated_size
-                estimated_size = total_estimated_size
-            else:
-                estimated_size = self.compressor.estimate_output_size(self.input_path, codec, crf)
+        video_files = (
+            self.get_video_files(self.input_path) if self.is_folder else [self.input_path]
+        )
+        if not video_files:
+            self.size_estimate_label.setText("N/A")
+            return
 
-            if estimated_size >= 1024:
-                self.size_estimate_label.setText(f"{estimated_size / 1024:.2f} ГБ")
-            else:
-                self.size_estimate_label.setText(f"{estimated_size:.2f} МБ")
-        except Exception as e:
+        # Оценка уходит в фоновый пул; токен отсекает результаты,
+        # пришедшие после смены кодека/CRF/выбора
+        self._estimate_token += 1
+        self.size_estimate_label.setText("Подсчёт...")
+        worker = EstimateWorker(self.compressor, video_files, codec, crf, self._estimate_token)
+        worker.signals.finished.connect(self._apply_size_estimate)
+        QThreadPool.globalInstance().start(worker)
+
+    def _apply_size_estimate(self, token, estimated_size):
+        if token != self._estimate_token:
+            return  # Результат уже неактуального запроса
+        if estimated_size < 0:
             self.size_estimate_label.setText("Ошибка оценки")
-            print(f"Ошибка при оценке размера: {str(e)}")
+        elif estimated_size >= 1024:
+            self.size_estimate_label.setText(f"{estimated_size / 1024:.2f} ГБ")
+        else:
+            self.size_estimate_label.setText(f"{estimated_size:.2f} МБ")
 
     def compress_video(self):
         if not (self.input_path and self.output_folder):
@@ -376,27 +657,23 @@ class MainWindow(QMainWindow):
 
         codec = self.codec_combo.currentText().split(" ")[0].lower()
         crf = self.crf_slider.value()
-        hw_accel = self.hw_accel_combo.currentText()
-
-        if hw_accel == "Нет":
-            hw_accel = None
-        elif "NVIDIA" in hw_accel:
-            hw_accel = "nvidia"
-        elif "AMD" in hw_accel:
-            hw_accel = "amd"
-        elif "Intel" in hw_accel:
-            hw_accel = "intel"
+        # Для "Нет" get вернёт None
+        hw_accel = _HW_ACCEL_BY_LABEL.get(self.hw_accel_combo.currentText().split(" ")[0])
 
         self.compress_button.setEnabled(False)
         self.progress_bar.setValue(0)
+        self._last_bar_value = 0
+        self._last_file_pct = -1
         self.current_file_label.setText("Текущий файл: N/A")
         self.file_progress_label.setText("Прогресс файла: 0%")
         self.overall_progress_label.setText("Общий прогресс: 0/0")
         self.eta_label.setText("Осталось времени: --:--")
 
-        # Установка начального времени для расчёта ETA
-        self.start_time = time.time()
-        self.last_progress_update = 0
+        # Сброс состояния ETA перед новым запуском
+        self._ema_rate = None
+        self._last_eta_pct = 0
+        self._last_eta_t = time.monotonic()
+        self._last_eta_text_t = 0.0
 
         if self.is_folder:
             video_files = self.get_video_files(self.input_path)
@@ -405,31 +682,29 @@ class MainWindow(QMainWindow):
                 self.compress_button.setEnabled(True)
                 return
 
-            self.compression_thread = FolderCompressionThread(
+            self.compression_task = FolderCompressionRunnable(
                 self.input_path, self.output_folder, codec, crf, hw_accel, video_files
             )
             self.total_files = len(video_files)
             self.overall_progress_label.setText(f"Общий прогресс: 0/{self.total_files}")
-            self.compression_thread.progress_update.connect(self.update_folder_progress)
-            self.compression_thread.compression_finished.connect(self.compression_completed)
-            self.compression_thread.start()
+            self.compression_task.signals.progress_update.connect(self.update_folder_progress)
+            self.compression_task.signals.compression_finished.connect(self.compression_completed)
+            QThreadPool.globalInstance().start(self.compression_task)
         else:
             base_name, ext = os.path.splitext(os.path.basename(self.input_path))
-            if codec == "vp9":
-                output_ext = ".webm"
-            elif codec == "av1":
-                output_ext = ".mkv"
-            else:
-                output_ext = ".mp4"
+            output_ext = _CODEC_EXT.get(codec, ".mp4")
             output_file = os.path.join(self.output_folder, f"{base_name}_compressed{output_ext}")
-            self.compression_thread = CompressionThread(
+            self.compression_task = CompressionRunnable(
                 self.input_path, output_file, codec, crf, hw_accel
             )
-            self.compression_thread.progress_update.connect(self.update_progress)
-            self.compression_thread.compression_finished.connect(self.compression_completed)
-            self.compression_thread.start()
+            self.compression_task.signals.progress_update.connect(self.update_progress)
+            self.compression_task.signals.compression_finished.connect(self.compression_completed)
+            QThreadPool.globalInstance().start(self.compression_task)
 
     def update_progress(self, value):
+        if value == self._last_bar_value:
+            return  # Ничего не изменилось — не трогаем виджеты
+        self._last_bar_value = value
         self.progress_bar.setValue(value)
         self.current_file_label.setText(f"Текущий файл: {os.path.basename(self.input_path)}")
         self.file_progress_label.setText(f"Прогресс файла: {value}%")
@@ -439,43 +714,63 @@ class MainWindow(QMainWindow):
         self.update_eta(value)
 
     def update_eta(self, progress):
-        """Расчёт и обновление оставшегося времени"""
+        """Расчёт оставшегося времени по EMA мгновенной скорости прогресса.
+
+        Сглаживание убирает скачки ETA в начале кодирования (elapsed/progress
+        при progress=1 завышает оценку в десятки раз) и дрожание текста.
+        """
         if progress <= 0:
             self.eta_label.setText("Осталось времени: --:--")
             return
 
-        current_time = time.time()
-        elapsed = current_time - self.start_time
-
-        # Избегаем деления на ноль
-        if progress > 0:
-            total_estimated = elapsed * 100 / progress
-            remaining = total_estimated - elapsed
-
-            # Форматируем оставшееся время
-            if remaining < 60:
-                time_str = f"{int(remaining)} сек."
-            elif remaining < 3600:
-                minutes = int(remaining // 60)
-                seconds = int(remaining % 60)
-                time_str = f"{minutes} мин. {seconds} сек."
+        now = time.monotonic()
+        delta_pct = progress - self._last_eta_pct
+        delta_t = now - self._last_eta_t
+        if delta_pct > 0 and delta_t > 0:
+            inst_rate = delta_pct / delta_t  # Процентов в секунду
+            if self._ema_rate is None:
+                self._ema_rate = inst_rate
             else:
-                hours = int(remaining // 3600)
-                minutes = int((remaining % 3600) // 60)
-                time_str = f"{hours} ч. {minutes} мин."
+                self._ema_rate = 0.2 * inst_rate + 0.8 * self._ema_rate
+            self._last_eta_pct = progress
+            self._last_eta_t = now
+
+        if not self._ema_rate:
+            return
 
-            self.eta_label.setText(f"Осталось времени: {time_str}")
+        # Текст перерисовываем не чаще раза в секунду
+        if now - self._last_eta_text_t < 1.0 and progress < 100:
+            return
+        self._last_eta_text_t = now
+
+        remaining = int((100 - progress) / self._ema_rate)
+        if remaining < 60:
+            time_str = f"{remaining} сек."
+        elif remaining < 3600:
+            minutes, seconds = divmod(remaining, 60)
+            time_str = f"{minutes} мин. {seconds} сек."
+        else:
+            hours, rem = divmod(remaining, 3600)
+            time_str = f"{hours} ч. {rem // 60} мин."
+
+        self.eta_label.setText(f"Осталось времени: {time_str}")
 
-            # Сохраняем последнее обновление для оптимизации
-            self.last_progress_update = progress
+    def update_folder_progress(self, tick):
+        # Распаковываем составной тик один раз
+        progress, file_name, file_progress = tick.overall, tick.file, tick.file_pct
+        if progress == self._last_bar_value and file_progress == self._last_file_pct:
+            return  # Ничего не изменилось — не трогаем виджеты
 
-    def update_folder_progress(self, progress, file_name, file_progress):
         # Обновляем общий прогресс в прогресс-баре
-        self.progress_bar.setValue(progress)
+        if progress != self._last_bar_value:
+            self._last_bar_value = progress
+            self.progress_bar.setValue(progress)
         self.current_file_label.setText(f"Текущий файл: {file_name}")
 
         # Обновляем прогресс текущего файла
-        self.file_progress_label.setText(f"Прогресс файла: {file_progress}%")
+        if file_progress != self._last_file_pct:
+            self._last_file_pct = file_progress
+            self.file_progress_label.setText(f"Прогресс файла: {file_progress}%")
 
         # Расчёт ETA для папки
         self.update_eta(progress)
@@ -490,6 +785,9 @@ class MainWindow(QMainWindow):
             )
 
     def update_file_progress(self, progress, file_name):
+        if progress == self._last_bar_value:
+            return  # Ничего не изменилось — не трогаем виджеты
+        self._last_bar_value = progress
         self.progress_bar.setValue(progress)
         self.current_file_label.setText(f"Текущий файл: {file_name}")
         self.file_progress_label.setText(f"Прогресс файла: {progress}%")
@@ -497,26 +795,16 @@ class MainWindow(QMainWindow):
         # Расчёт ETA для папки
         self.update_eta(progress)
 
-    def compression_completed(self, success, message, elapsed_time, input_size_mb, output_size_mb):
+    def compression_completed(self, success, message):
+        # Текст уже собран в воркере — UI-потоку остаётся только показать его
         self.compress_button.setEnabled(True)
-        minutes = int(elapsed_time // 60)
-        seconds = int(elapsed_time % 60)
-        time_str = f"{minutes} мин. {seconds} сек."
-        result_message = f"{message}\n\nВремя обработки: {time_str}"
-
-        if success and input_size_mb > 0:
-            compression_ratio = (output_size_mb / input_size_mb) * 100 if input_size_mb > 0 else 0
-            result_message += f"\n\nИсходный размер: {input_size_mb:.2f} МБ\n"
-            result_message += f"Конечный размер: {output_size_mb:.2f} МБ\n"
-            result_message += f"Степень сжатия: {compression_ratio:.1f}%"
-
         if success:
-            QMessageBox.information(self, "Успех", result_message)
+            QMessageBox.information(self, "Успех", message)
         else:
-            QMessageBox.critical(self, "Ошибка", result_message)
+            QMessageBox.critical(self, "Ошибка", message)
 
     def closeEvent(self, event):
         """Обработка закрытия окна"""
-        if self.compression_thread and self.compression_thread.isRunning():
-            self.compression_thread.stop()
+        if self.compression_task and not self.compression_task.finished:
+            self.compression_task.stop()
         event.accept()
@@ -1,25 +1,212 @@
+import asyncio
+import collections
+import functools
+import json
 import os
 import re
+import shutil
+import signal
 import subprocess
-import time
+import tempfile
+import threading
 from typing import Callable, Optional
 
+try:
+    import av  # PyAV: метаданные через libav без запуска подпроцесса
+except ImportError:
+    av = None
+
+_ProbeResult = collections.namedtuple("_ProbeResult", ["duration", "bitrate"])
+
+# Соответствие программных пресетов шкале NVENC p1-p7
+_NVENC_PRESET = {"faster": "p2", "medium": "p4", "slow": "p6"}
+
+# Для пути без колбэка: итоговый размер из накопленного вывода communicate()
+_TOTAL_SIZE_RE = re.compile(rb"total_size=(\d+)")
+
+
+def _read_metadata_av(input_file: str) -> _ProbeResult:
+    """Читает длительность и битрейт in-process через libav (PyAV).
+
+    Экономит fork+exec и инициализацию ffprobe (~30-80 мс) на каждый запрос
+    метаданных — заметно на пути оценки размера в GUI.
+    """
+    with av.open(input_file) as container:
+        duration = (container.duration or 0) / av.time_base
+        video_streams = container.streams.video
+        bitrate = (video_streams[0].bit_rate or 0) if video_streams else 0
+        if not bitrate:
+            bitrate = container.bit_rate or 0
+        if not bitrate and duration > 0:
+            bitrate = int(os.path.getsize(input_file) * 8 / duration)
+        return _ProbeResult(duration, bitrate)
+
+
+@functools.lru_cache(maxsize=1)
+def _ffprobe_path() -> str:
+    """Абсолютный путь к ffprobe (один поиск в PATH на процесс).
+
+    Полный путь — обязательное условие быстрого пути posix_spawn
+    в subprocess: без fork не дублируются таблицы страниц родителя,
+    что заметно при коротких частых запусках ffprobe.
+    """
+    return shutil.which("ffprobe") or "ffprobe"
+
+
+def _probe_command(input_file: str) -> list:
+    """Команда ffprobe: длительность и битрейт одним вызовом (JSON)"""
+    return [
+        _ffprobe_path(),
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "format=duration,bit_rate:stream=bit_rate",
+        "-of",
+        "json",
+        input_file,
+    ]
+
+
+def _parse_probe_output(input_file: str, stdout: str) -> _ProbeResult:
+    """Разбирает JSON-вывод ffprobe в _ProbeResult"""
+    payload = json.loads(stdout or "{}")
+    fmt = payload.get("format", {})
+    streams = payload.get("streams", [])
+
+    try:
+        duration = float(fmt.get("duration", 0))
+    except (TypeError, ValueError):
+        duration = 0.0
+
+    # Битрейт потока, затем контейнера, затем оценка по размеру файла
+    bitrate = 0
+    for source in ((streams[0] if streams else {}), fmt):
+        try:
+            bitrate = int(source.get("bit_rate", 0))
+        except (TypeError, ValueError):
+            bitrate = 0
+        if bitrate:
+            break
+    if not bitrate and duration > 0:
+        bitrate = int(os.path.getsize(input_file) * 8 / duration)
+
+    return _ProbeResult(duration, bitrate)
+
+
+def _read_metadata(input_file: str) -> _ProbeResult:
+    """Читает метаданные через ffprobe синхронно"""
+    # close_fds=False — второе условие posix_spawn; безопасно, потому что
+    # Python открывает свои дескрипторы с CLOEXEC
+    result = subprocess.run(
+        _probe_command(input_file), capture_output=True, text=True, check=True, close_fds=False
+    )
+    return _parse_probe_output(input_file, result.stdout)
+
+
+async def _read_metadata_async(input_file: str) -> _ProbeResult:
+    """Читает метаданные через ffprobe в asyncio-подпроцессе"""
+    process = await asyncio.create_subprocess_exec(
+        *_probe_command(input_file),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe завершился с кодом {process.returncode}")
+    return _parse_probe_output(input_file, stdout.decode(errors="replace"))
+
+
+# Кеш метаданных: (путь, mtime_ns, размер) -> _ProbeResult.
+# Обычный словарь вместо lru_cache, чтобы пакетный префетч мог
+# складывать результаты напрямую
+_PROBE_CACHE = {}
+_PROBE_CACHE_LIMIT = 4096
+
+
+def _store_probe(key, result):
+    """Кладёт результат в кеш, не давая ему расти безгранично"""
+    if len(_PROBE_CACHE) >= _PROBE_CACHE_LIMIT:
+        _PROBE_CACHE.clear()  # Переполнение маловероятно — проще начать заново
+    _PROBE_CACHE[key] = result
+
+
+def _probe(input_file: str, mtime_ns: int, size: int) -> _ProbeResult:
+    """Кешированные метаданные файла: (длительность, битрейт).
+
+    mtime_ns и размер входят в ключ кеша, поэтому изменённый файл
+    перечитывается, а повторные потребители (оценка размера, затем само
+    сжатие) не запускают ffprobe заново.
+    """
+    key = (input_file, mtime_ns, size)
+    cached = _PROBE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    result = None
+    if av is not None:
+        try:
+            result = _read_metadata_av(input_file)
+        except Exception:
+            pass  # Нечитаемый для libav файл — пробуем ffprobe
+    if result is None:
+        result = _read_metadata(input_file)
+    _store_probe(key, result)
+    return result
+
 
 class VideoCompressor:
     """Класс для сжатия видео с использованием FFmpeg"""
 
     def __init__(self):
         self._check_ffmpeg()
+        self._hwaccels = None  # Лениво заполняется из ffmpeg -hwaccels
+        self._nvenc_caps = {}  # Кеш справки по NVENC-кодировщикам
+        try:
+            # Доступные ЭТОМУ процессу ядра (уважает cgroups/taskset),
+            # а не общее число ядер машины
+            self._cpu_count = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            self._cpu_count = os.cpu_count() or 4
+
+    def _available_hwaccels(self):
+        """Методы аппаратного декодирования, собранные в этой сборке ffmpeg.
+
+        Запрашивается один раз на процесс: вывод -hwaccels не меняется
+        между запусками.
+        """
+        if self._hwaccels is None:
+            try:
+                result = subprocess.run(
+                    ["ffmpeg", "-hide_banner", "-hwaccels"],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                self._hwaccels = frozenset(
+                    line.strip()
+                    for line in result.stdout.splitlines()[1:]
+                    if line.strip()
+                )
+            except (subprocess.SubprocessError, FileNotFoundError):
+                self._hwaccels = frozenset()
+        return self._hwaccels
+
+    # Результат поиска в PATH общий для всех экземпляров: достаточно
+    # одного обхода вместо запуска ffmpeg -version на каждый конструктор
+    _ffmpeg_checked = False
 
     def _check_ffmpeg(self):
         """Проверяет наличие FFmpeg в системе"""
-        try:
-            subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
+        if VideoCompressor._ffmpeg_checked:
+            return
+        if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
             raise RuntimeError(
                 "FFmpeg не найден. Пожалуйста, установите FFmpeg и убедитесь, "
                 "что он доступен в системном PATH."
             )
+        VideoCompressor._ffmpeg_checked = True
 
     def compress_video(
         self,
@@ -29,7 +216,10 @@ class VideoCompressor:
         crf: int = 23,
         hardware_acceleration: Optional[str] = None,
         progress_callback: Optional[Callable[[int], None]] = None,
-    ) -> None:
+        threads: Optional[int] = None,
+        preset: str = "faster",
+        tune: Optional[str] = None,
+    ) -> Optional[int]:
         """
         Сжимает видео с указанными параметрами.
 
@@ -40,185 +230,530 @@ class VideoCompressor:
             crf: Constant Rate Factor, параметр качества (0-51)
             hardware_acceleration: Тип аппаратного ускорения (nvidia, amd, intel или None)
             progress_callback: Функция обратного вызова для обновления прогресса (0-100)
+            threads: Число потоков программного кодека (None — автовыбор ffmpeg)
+            preset: Пресет скорости кодирования (faster/medium/slow);
+                "faster" почти не теряет в качестве при том же CRF,
+                но кодирует в разы быстрее "medium"
+            tune: Профиль настройки x264/x265 (film, animation, grain,
+                fastdecode, zerolatency...); None — без настройки
+
+        Returns:
+            Размер выходного файла в байтах по данным потока прогресса ffmpeg
+            (total_size=...), либо None, если ffmpeg его не сообщил
         """
         if not os.path.exists(input_file):
             raise FileNotFoundError(f"Входной файл не найден: {input_file}")
 
-        # Буферизация вывода для улучшения производительности
+        command = self._prepare_command(
+            input_file, output_file, codec, crf, hardware_acceleration, threads, preset, tune
+        )
+        duration = self._get_video_duration(input_file)
+
+        if progress_callback and self._can_use_asyncio():
+            # Ожидание данных в пайпе выполняет селектор event loop'а на
+            # уровне C, а не readline-цикл с подсыпаниями в Python
+            return asyncio.run(self._run_async(command, duration, progress_callback))
+
+        # Синхронный путь: без колбэка или внутри чужого event loop
         process = None
         try:
-            command = self._prepare_command(
-                input_file, output_file, codec, crf, hardware_acceleration
-            )
-
-            # Запускаем процесс с правильной настройкой буферов и потоков
+            # Пайпы в бинарном режиме: поток прогресса — чистый ASCII,
+            # декодирование каждой строки было бы лишней работой
             process = subprocess.Popen(
                 command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                universal_newlines=True,
-                text=True,
-                bufsize=1,  # Построчная буферизация для более стабильной работы
+                **self._POPEN_KWARGS,
             )
 
-            duration = self._get_video_duration(input_file)
-
-            if process.returncode is None:  # Проверяем, что процесс еще запущен
-                if progress_callback:
-                    self._monitor_progress(process, duration, progress_callback)
-                else:
-                    stdout, stderr = process.communicate()  # Ожидаем завершения и читаем все потоки
-
-            if process and process.returncode != 0:
-                stderr_output = (
-                    process.stderr.read() if process and process.stderr else "Неизвестная ошибка"
+            stderr_data = b""
+            if progress_callback:
+                # stderr дренируется фоновым потоком: иначе разговорчивый
+                # ffmpeg заполняет пайп и намертво виснет, пока мы ждём stdout
+                stderr_tail = collections.deque(maxlen=256)
+                drain = threading.Thread(
+                    target=self._drain_stderr,
+                    args=(process.stderr, stderr_tail),
+                    daemon=True,
                 )
+                drain.start()
+                output_size = self._monitor_progress(process, duration, progress_callback)
+                drain.join(timeout=5)
+                stderr_data = b"".join(stderr_tail)
+            else:
+                stdout, stderr_data = process.communicate()  # Ожидаем завершения
+                sizes = _TOTAL_SIZE_RE.findall(stdout or b"")
+                output_size = int(sizes[-1]) if sizes else None
+
+            if process.returncode != 0:
+                stderr_output = stderr_data.decode(errors="replace") or "Неизвестная ошибка"
                 raise RuntimeError(f"Ошибка FFmpeg: {stderr_output}")
 
+            return output_size
+
         except Exception as e:
             if process:
                 # Корректное завершение процесса ffmpeg
-                process.terminate()
+                self._signal_process(process)
                 try:
                     process.wait(timeout=5)  # Ждем 5 секунд
                 except subprocess.TimeoutExpired:
-                    process.kill()  # Принудительное завершение
+                    self._signal_process(process, kill=True)
                     process.wait()
             raise e
 
-    def _prepare_command(self, input_file, output_file, codec, crf, hardware_acceleration):
+    # Программные кодеки: (энкодер, масштаб CRF, дополнительные флаги).
+    # Новый кодек добавляется строкой в таблице, без новой ветки if/elif
+    _SW_CODECS = {
+        "h264": ("libx264", 1.0, []),
+        "h265": ("libx265", 1.0, []),
+        "vp9": ("libvpx-vp9", 1.23, []),
+        "av1": ("libaom-av1", 1.0, ["-strict", "experimental"]),
+    }
+
+    # setsid выделяет ffmpeg в собственную группу процессов: сигнал при
+    # отмене доходит и до его дочерних процессов, а Ctrl+C в терминале
+    # не прилетает ffmpeg напрямую в обход нашей очистки (POSIX only)
+    _POPEN_KWARGS = {"start_new_session": True} if os.name != "nt" else {}
+
+    @staticmethod
+    async def _drain_stderr_async(stream, tail):
+        """Асинхронный вариант _drain_stderr для пути через event loop"""
+        try:
+            while True:
+                line = await stream.readline()
+                if not line:
+                    break
+                tail.append(line)
+        except (asyncio.LimitOverrunError, ValueError):
+            pass  # Строка длиннее лимита StreamReader — пропускаем
+
+    @staticmethod
+    def _drain_stderr(stream, tail):
+        """Вычитывает stderr в кольцевой буфер строк.
+
+        Хранится только хвост (maxlen): для сообщения об ошибке важны
+        последние строки, а многочасовой лог варнингов не копится в памяти.
+        """
+        try:
+            for line in stream:
+                tail.append(line)
+        except (IOError, ValueError):
+            pass  # Пайп закрыт при отмене
+
+    @staticmethod
+    def _signal_process(process, kill=False):
+        """Завершает ffmpeg вместе с его группой процессов (на Windows — сам процесс)"""
+        if os.name != "nt":
+            try:
+                os.killpg(
+                    os.getpgid(process.pid),
+                    signal.SIGKILL if kill else signal.SIGTERM,
+                )
+                return
+            except (ProcessLookupError, PermissionError, OSError):
+                pass  # Группа уже исчезла — добиваем обычным способом
+        if kill:
+            process.kill()
+        else:
+            process.terminate()
+
+    @staticmethod
+    def _can_use_asyncio() -> bool:
+        """Проверяет, что в текущем потоке нет работающего event loop"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return True
+        return False
+
+    async def _run_async(self, command, total_duration, progress_callback):
+        """Запускает ffmpeg и читает его вывод через asyncio-подпроцесс"""
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **self._POPEN_KWARGS,
+        )
+        try:
+            # stderr вычитывается параллельно, чтобы ffmpeg не блокировался
+            # на переполненном пайпе; храним только хвост, как в синхронном пути
+            stderr_tail = collections.deque(maxlen=256)
+            stderr_task = asyncio.ensure_future(
+                self._drain_stderr_async(process.stderr, stderr_tail)
+            )
+            output_size = await self._monitor_progress_async(
+                process, total_duration, progress_callback
+            )
+            await process.wait()
+            await stderr_task
+            stderr_data = b"".join(stderr_tail)
+
+            if process.returncode != 0:
+                stderr_output = stderr_data.decode(errors="replace") or "Неизвестная ошибка"
+                raise RuntimeError(f"Ошибка FFmpeg: {stderr_output}")
+
+            progress_callback(100)
+            return output_size
+        except Exception:
+            if process.returncode is None:
+                # Корректное завершение процесса ffmpeg
+                self._signal_process(process)
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    self._signal_process(process, kill=True)
+                    await process.wait()
+            raise
+
+    async def _monitor_progress_async(self, process, total_duration, progress_callback):
+        """Мониторинг прогресса FFmpeg из asyncio-потока stdout (bytes).
+
+        Возвращает последний total_size, который сообщил ffmpeg (байты).
+        """
+        last_progress = -1
+        total_duration_us = int(total_duration * 1_000_000)
+        output_size = None
+
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break  # EOF — ffmpeg закрыл stdout
+
+            # Ключи прогресса всегда стоят в нулевой колонке: достаточно
+            # startswith и среза вместо входа в движок регулярных выражений
+            if line.startswith(b"total_size="):
+                try:
+                    output_size = int(line[11:])
+                except ValueError:
+                    pass  # total_size=N/A
+                continue
+
+            if line.startswith(b"out_time_ms="):
+                if total_duration_us <= 0:
+                    # Длительность неизвестна (поток, битые метаданные):
+                    # процент не посчитать, но сжатие должно дойти до конца
+                    continue
+                try:
+                    # out_time_ms, вопреки имени, отдаёт микросекунды
+                    current_us = int(line[12:])
+                except ValueError:
+                    continue  # out_time_ms=N/A до первого кадра
+                progress = min(100, current_us * 100 // total_duration_us)
+
+                # Прогресс целочисленный: максимум 100 срабатываний за файл,
+                # дросселировать по часам нет смысла
+                if progress != last_progress:
+                    progress_callback(progress)
+                    last_progress = progress
+
+        return output_size
+
+    def _prepare_command(
+        self,
+        input_file,
+        output_file,
+        codec,
+        crf,
+        hardware_acceleration,
+        threads=None,
+        preset="faster",
+        tune=None,
+    ):
         """Подготовка команды ffmpeg с оптимизированными параметрами"""
-        command = ["ffmpeg", "-i", input_file]
+        command = ["ffmpeg"]
+        if hardware_acceleration:
+            # Флаги декодера должны стоять до -i
+            command.extend(self._get_hw_decode_args(codec, hardware_acceleration))
+        # genpts восстанавливает отсутствующие PTS на входе — копирование
+        # аудиодорожки не спотыкается о битые таймстемпы
+        command.extend(["-fflags", "+genpts", "-i", input_file])
 
-        # Добавляем оптимизированные параметры буферизации
-        command.extend(["-thread_queue_size", "4096"])
+        # Очередь пакетов демультиплексора масштабируется по числу ядер:
+        # фиксированные 4096 малы для 32-ядерных машин и избыточны для 2-ядерных
+        queue_size = min(8192, max(512, self._cpu_count * 256))
+        command.extend(["-thread_queue_size", str(queue_size)])
 
         if hardware_acceleration:
-            command.extend(self._get_hw_accel_args(codec, crf, hardware_acceleration))
+            command.extend(self._get_hw_accel_args(codec, crf, hardware_acceleration, preset))
         else:
-            command.extend(self._get_software_codec_args(codec, crf))
+            command.extend(self._get_software_codec_args(codec, crf, threads, preset, tune))
 
-        command.extend(["-c:a", "copy", "-progress", "-", "-nostats", "-y", output_file])
+        # Машиночитаемый прогресс key=value на stdout вместо разбора stderr
+        command.extend(["-c:a", "copy", "-progress", "pipe:1", "-nostats", "-y", output_file])
         return command
 
-    def _get_hw_accel_args(self, codec, crf, hardware_acceleration):
-        """Получение оптимизированных параметров для аппаратного ускорения"""
+    def _get_hw_decode_args(self, codec, hardware_acceleration):
+        """Флаги аппаратного декодирования: кадры не покидают память GPU.
+
+        Без них декодирование идёт на CPU и каждый кадр копируется через
+        PCIe в видеопамять перед кодированием.
+        """
+        if codec not in ("h264", "h265"):
+            return []
+        # Если метода нет в этой сборке ffmpeg — декодируем на CPU,
+        # а не падаем с "Unrecognized hwaccel"
+        available = self._available_hwaccels()
+        if hardware_acceleration == "nvidia" and "cuda" in available:
+            return ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+        if hardware_acceleration == "intel" and "qsv" in available:
+            return ["-hwaccel", "qsv", "-hwaccel_output_format", "qsv"]
+        if hardware_acceleration == "amd":
+            # У AMF нет декодера в FFmpeg: на Windows — D3D11VA, иначе VAAPI
+            method = "d3d11va" if os.name == "nt" else "vaapi"
+            if method in available:
+                return ["-hwaccel", method]
+        return []
+
+    def _nvenc_quality_args(self, encoder):
+        """Флаги качества NVENC, поддерживаемые этой сборкой ffmpeg и GPU.
+
+        Справка по кодировщику запрашивается один раз на процесс: на старых
+        поколениях (до Turing) или урезанных сборках флагов просто нет,
+        и слепое их добавление валит весь запуск.
+        """
+        cached = self._nvenc_caps.get(encoder)
+        if cached is None:
+            try:
+                result = subprocess.run(
+                    ["ffmpeg", "-hide_banner", "-h", f"encoder={encoder}"],
+                    capture_output=True,
+                    text=True,
+                )
+                help_text = result.stdout
+            except (subprocess.SubprocessError, FileNotFoundError):
+                help_text = ""
+
+            cached = []
+            if "-spatial_aq" in help_text:
+                # Адаптивное квантование и lookahead: заметный выигрыш
+                # качества на том же битрейте почти без потери скорости
+                cached.extend(["-spatial_aq", "1", "-temporal_aq", "1", "-rc-lookahead", "20"])
+            if "-b_ref_mode" in help_text:
+                # B-кадры с опорным средним кадром (Turing и новее)
+                cached.extend(["-bf", "3", "-b_ref_mode", "middle"])
+            self._nvenc_caps[encoder] = cached
+        return cached
+
+    def _get_hw_accel_args(self, codec, crf, hardware_acceleration, preset="faster"):
+        """Получение параметров аппаратного кодировщика с упором на пропускную способность"""
+        if codec not in ("h264", "h265"):
+            # Аппаратные кодировщики есть только для h264/h265,
+            # vp9/av1 остаются на программном пути
+            return self._get_software_codec_args(codec, crf, preset=preset)
+
+        # -crf сюда не попадает: аппаратные кодировщики молча игнорируют его
+        # и валятся в дефолтный битрейт. CRF транслируется в их собственные
+        # ручки качества, зажатый в допустимый диапазон
+        cq = min(51, max(1, crf))
+
         args = []
         if hardware_acceleration == "nvidia":
-            if codec == "h264":
-                args.extend(["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "hq"])
-            elif codec == "h265":
-                args.extend(["-c:v", "hevc_nvenc", "-preset", "p4", "-tune", "hq"])
+            encoder = "h264_nvenc" if codec == "h264" else "hevc_nvenc"
+            nvenc_preset = _NVENC_PRESET.get(preset, "p4")
+            args.extend(
+                [
+                    "-c:v",
+                    encoder,
+                    "-preset",
+                    nvenc_preset,
+                    # hq вместо ll: low-latency отключает lookahead и B-кадры,
+                    # а задержка для офлайн-сжатия не важна
+                    "-tune",
+                    "hq",
+                    "-rc",
+                    "vbr",
+                    "-cq",
+                    str(cq),
+                ]
+            )
+            args.extend(self._nvenc_quality_args(encoder))
         elif hardware_acceleration == "amd":
-            if codec == "h264":
-                args.extend(["-c:v", "h264_amf", "-quality", "quality"])
-            elif codec == "h265":
-                args.extend(["-c:v", "hevc_amf", "-quality", "quality"])
+            encoder = "h264_amf" if codec == "h264" else "hevc_amf"
+            args.extend(
+                [
+                    "-c:v",
+                    encoder,
+                    "-usage",
+                    "transcoding",
+                    "-quality",
+                    "speed",
+                    "-rc",
+                    "cqp",
+                    "-qp_i",
+                    str(cq),
+                    "-qp_p",
+                    str(cq),
+                ]
+            )
         elif hardware_acceleration == "intel":
-            if codec == "h264":
-                args.extend(["-c:v", "h264_qsv", "-preset", "slower"])
-            elif codec == "h265":
-                args.extend(["-c:v", "hevc_qsv", "-preset", "slower"])
-
-        if codec in ["h264", "h265"]:
-            args.extend(["-crf", str(crf)])
+            encoder = "h264_qsv" if codec == "h264" else "hevc_qsv"
+            # async_depth держит конвейер QSV заполненным
+            args.extend(
+                [
+                    "-c:v",
+                    encoder,
+                    "-preset",
+                    "veryfast",
+                    "-async_depth",
+                    "8",
+                    "-global_quality",
+                    str(cq),
+                ]
+            )
+        else:
+            # Неизвестное значение ускорения — честный программный путь,
+            # а не пустой список, отдающий выбор кодека на откуп ffmpeg
+            return self._get_software_codec_args(codec, crf, preset=preset)
         return args
 
-    def _get_software_codec_args(self, codec: str, crf: int) -> list:
+    def _get_software_codec_args(
+        self,
+        codec: str,
+        crf: int,
+        threads: Optional[int] = None,
+        preset: str = "faster",
+        tune: Optional[str] = None,
+    ) -> list:
         """Возвращает аргументы для программного кодека"""
-        if codec == "h264":
-            return ["-c:v", "libx264", "-preset", "medium", "-crf", str(crf)]
-        elif codec == "h265":
-            return ["-c:v", "libx265", "-preset", "medium", "-crf", str(crf)]
-        elif codec == "vp9":
-            vp9_crf = min(63, int(crf * 1.23))
-            return ["-c:v", "libvpx-vp9", "-b:v", "0", "-crf", str(vp9_crf)]
-        elif codec == "av1":
-            return ["-c:v", "libaom-av1", "-crf", str(crf), "-b:v", "0", "-strict", "experimental"]
-        else:
-            raise ValueError(f"Неподдерживаемый кодек: {codec}")
+        # Без явного значения используем все доступные процессу ядра:
+        # автовыбор ffmpeg для vp9/av1 заметно консервативнее
+        threads = threads or self._cpu_count
+        thread_args = ["-threads", str(threads)]
+        # Для MP4-выхода: faststart переносит moov-атом в начало файла
+        # (мгновенный старт воспроизведения), yuv420p гарантирует
+        # совместимость с аппаратными декодерами плееров
+        mp4_args = ["-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+
+        try:
+            encoder, crf_scale, extra_args = self._SW_CODECS[codec]
+        except KeyError:
+            raise ValueError(f"Неподдерживаемый кодек: {codec}") from None
+
+        if codec in ("h264", "h265"):
+            args = ["-c:v", encoder, "-preset", preset, "-crf", str(crf)]
+            if tune:
+                args.extend(["-tune", tune])
+            if codec == "h265":
+                # pools=* задействует все NUMA-узлы, frame-threads=0 —
+                # автовыбор x265 вместо его консервативного дефолта
+                args.extend(["-x265-params", "pools=*:frame-threads=0"])
+            return args + mp4_args + thread_args
+
+        # vp9/av1: режим constant quality (-b:v 0) со своей шкалой CRF;
+        # row-mt и тайлы — основные ручки масштабирования по ядрам
+        scaled_crf = min(63, int(crf * crf_scale))
+        return (
+            ["-c:v", encoder, "-b:v", "0", "-crf", str(scaled_crf)]
+            + extra_args
+            + ["-row-mt", "1", "-tile-columns", str((threads - 1).bit_length())]
+            + thread_args
+        )
+
+    def _probe_cached(self, input_file: str) -> _ProbeResult:
+        """Метаданные файла через кеш по (путь, mtime_ns, размер)"""
+        try:
+            st = os.stat(input_file)
+        except OSError:
+            return _ProbeResult(0.0, 0)
+        return _probe(input_file, st.st_mtime_ns, st.st_size)
 
     def _get_video_duration(self, input_file: str) -> float:
         """Определяет длительность видео в секундах"""
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            input_file,
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        try:
-            return float(result.stdout.strip())
-        except ValueError:
-            return 0.0
+        return self._probe_cached(input_file).duration
 
     def _monitor_progress(
         self,
         process: subprocess.Popen,
         total_duration: float,
         progress_callback: Callable[[int], None],
-    ) -> None:
-        """Оптимизированный мониторинг прогресса FFmpeg"""
-        time_pattern = re.compile(r"out_time_ms=(\d+)")
+    ) -> Optional[int]:
+        """Оптимизированный мониторинг прогресса FFmpeg.
+
+        Возвращает последний total_size, который сообщил ffmpeg (байты).
+        """
         last_progress = -1
-        last_update_time = 0
-        update_interval = 0.5  # Интервал обновления в секундах
+        # Длительность в микросекундах: процент считается целочисленно,
+        # без float-деления на каждую строку прогресса
+        total_duration_us = int(total_duration * 1_000_000)
+        output_size = None
 
-        # Используем безопасное чтение с обработкой закрытых потоков
         try:
-            while process.poll() is None:
-                try:
-                    line = process.stdout.readline()
-                    if not line:
-                        time.sleep(0.1)  # Небольшая задержка, чтобы не загружать CPU
+            # Блокирующее чтение до EOF: readline сам ждёт данных в пайпе,
+            # опрос poll() со сном не нужен и только жёг CPU впустую
+            for line in process.stdout:
+                # Ключи прогресса всегда стоят в нулевой колонке: достаточно
+                # startswith и среза вместо движка регулярных выражений
+                if line.startswith(b"total_size="):
+                    try:
+                        output_size = int(line[11:])
+                    except ValueError:
+                        pass  # total_size=N/A
+                    continue
+
+                if line.startswith(b"out_time_ms="):
+                    if total_duration_us <= 0:
+                        # Длительность неизвестна (поток, битые метаданные):
+                        # процент не посчитать, но сжатие должно дойти до конца
                         continue
+                    try:
+                        # out_time_ms, вопреки имени, отдаёт микросекунды
+                        current_us = int(line[12:])
+                    except ValueError:
+                        continue  # out_time_ms=N/A до первого кадра
+                    progress = min(100, current_us * 100 // total_duration_us)
+
+                    # Прогресс целочисленный: максимум 100 срабатываний за файл,
+                    # дросселировать по часам нет смысла
+                    if progress != last_progress:
+                        progress_callback(progress)
+                        last_progress = progress
+        except (IOError, BrokenPipeError, ValueError):
+            # Поток закрыли досрочно (terminate) — просто дожидаемся процесса
+            pass
+
+        # stdout дочитан до EOF, stderr вычитывает фоновый поток —
+        # остаётся дождаться кода возврата
+        try:
+            process.wait()
+        except Exception:
+            pass
 
-                    match = time_pattern.search(line)
-                    if match:
-                        current_ms = int(match.group(1))
-                        current_secs = current_ms / 1000000
-                        progress = min(100, int((current_secs / total_duration) * 100))
-
-                        current_time = time.time()
-                        if (
-                            progress != last_progress
-                            and current_time - last_update_time >= update_interval
-                        ):
-                            progress_callback(progress)
-                            last_progress = progress
-                            last_update_time = current_time
-                except (ValueError, IOError, BrokenPipeError):
-                    # Обработка возможных исключений при чтении потока
-                    break
-
-            # Собираем оставшийся вывод, чтобы избе��ать блокировки буферов
-            try:
-                process.communicate()
-            except Exception:
-                pass
+        # Завершающее обновление прогресса
+        if process.returncode == 0:
+            progress_callback(100)
 
-            # Завершающее обновление прогресса
-            if process.returncode == 0:
-                progress_callback(100)
+        return output_size
 
-        except Exception as e:
-            # Перехватываем любые исключения при мониторинге, чтобы не крашить программу
-            print(f"Ошибка при мониторинге прогресса: {e}")
+    def estimate_output_size(
+        self, input_file: str, codec: str, crf: int, accurate: bool = False
+    ) -> float:
+        """Оценивает размер выходного файла в МБ.
 
-    def estimate_output_size(self, input_file: str, codec: str, crf: int) -> float:
-        """Оценивает размер выходного файла в МБ"""
+        accurate=True дополнительно кодирует 5-секундный фрагмент из
+        середины файла реальным кодеком и экстраполирует его размер —
+        на порядок точнее эвристики по битрейту, но стоит секунд CPU.
+        """
         if not os.path.exists(input_file):
             return 0.0
 
         input_size_mb = os.path.getsize(input_file) / (1024 * 1024)
 
+        if accurate:
+            try:
+                st = os.stat(input_file)
+                sample_mb = self._sample_encode_size(
+                    input_file, st.st_mtime_ns, codec, crf
+                )
+                if sample_mb > 0:
+                    return sample_mb
+            except Exception as e:
+                print(f"Ошибка пробного кодирования: {e}")
+                # Падаем обратно на быструю эвристику
+
         try:
-            original_bitrate = self._get_video_bitrate(input_file)
-            video_duration = self._get_video_duration(input_file)
+            # Один обращение к объединённому пробу вместо двух раздельных
+            video_duration, original_bitrate = self._probe_cached(input_file)
             if original_bitrate > 0 and video_duration > 0:
                 return self._estimate_using_bitrate(codec, crf, original_bitrate, video_duration)
         except Exception as e:
@@ -232,29 +767,84 @@ class VideoCompressor:
         estimated_size_mb = input_size_mb * compression_ratio
         return max(0.1, estimated_size_mb)
 
+    def estimate_output_sizes(self, input_files, codec: str, crf: int) -> list:
+        """Оценивает размеры для набора файлов (МБ, в порядке входа).
+
+        Метаданные ещё не закешированных файлов запрашиваются пачкой
+        параллельных asyncio-подпроцессов ffprobe, после чего сами оценки
+        считаются из уже тёплого кеша. Результаты префетча переиспользует
+        и последующее сжатие.
+        """
+        files = list(input_files)
+        # С PyAV метаданные читаются in-process — префетч подпроцессами не нужен
+        if av is None and len(files) > 1 and self._can_use_asyncio():
+            try:
+                asyncio.run(self._prefetch_probes(files))
+            except Exception:
+                pass  # Оценим последовательно, как раньше
+        return [self.estimate_output_size(f, codec, crf) for f in files]
+
+    async def _prefetch_probes(self, files):
+        """Параллельно прогревает кеш метаданных, не больше ядра на ffprobe"""
+        semaphore = asyncio.Semaphore(self._cpu_count)
+
+        async def probe_one(path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                return
+            key = (path, st.st_mtime_ns, st.st_size)
+            if key in _PROBE_CACHE:
+                return
+            async with semaphore:
+                try:
+                    result = await _read_metadata_async(path)
+                except Exception:
+                    return  # Синхронный путь повторит попытку и доложит об ошибке
+            _store_probe(key, result)
+
+        await asyncio.gather(*(probe_one(f) for f in files))
+
+    @functools.lru_cache(maxsize=1024)
+    def _sample_encode_size(
+        self, input_file: str, mtime_ns: int, codec: str, crf: int
+    ) -> float:
+        """Экстраполирует размер выхода по пробному кодированию фрагмента.
+
+        mtime_ns входит в ключ кеша по той же схеме, что и _probe;
+        кеш на методе безопасен, потому что экземпляр один (get_compressor).
+        """
+        duration = self._probe_cached(input_file).duration
+        if duration <= 0:
+            return 0.0
+
+        # Фрагмент из первой трети: начало файла часто нетипично
+        # (титры, статичные планы)
+        start = duration / 3
+        sample_len = min(5.0, max(0.5, duration - start))
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".mkv")
+        os.close(fd)
+        try:
+            command = (
+                ["ffmpeg", "-ss", f"{start:.3f}", "-t", f"{sample_len:.3f}"]
+                + ["-i", input_file]
+                + self._get_software_codec_args(codec, crf)
+                + ["-an", "-f", "matroska", "-y", tmp_path]
+            )
+            subprocess.run(command, capture_output=True, check=True)
+            sample_bytes = os.path.getsize(tmp_path)
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+        return sample_bytes * (duration / sample_len) / (1024 * 1024)
+
     def _get_video_bitrate(self, input_file: str) -> int:
         """Определяет битрейт видео в bps"""
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=bit_rate",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            input_file,
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        try:
-            return int(result.stdout.strip())
-        except (ValueError, TypeError):
-            filesize = os.path.getsize(input_file) * 8
-            duration = self._get_video_duration(input_file)
-            if duration > 0:
-                return int(filesize / duration)
-            return 0
+        return self._probe_cached(input_file).bitrate
 
     def _estimate_using_bitrate(
         self, codec: str, crf: int, original_bitrate: int, duration: float
@@ -267,3 +857,13 @@ class VideoCompressor:
         estimated_bitrate = original_bitrate * reduction * crf_factor
         estimated_size_mb = (estimated_bitrate * duration) / 8 / (1024 * 1024)
         return max(0.1, estimated_size_mb)
+
+
+@functools.lru_cache(maxsize=1)
+def get_compressor() -> VideoCompressor:
+    """Возвращает общий экземпляр VideoCompressor (один на процесс).
+
+    Проверка наличия FFmpeg в конструкторе выполняется один раз,
+    а не при создании каждой задачи сжатия.
+    """
+    return VideoCompressor()